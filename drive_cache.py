@@ -0,0 +1,203 @@
+"""
+Local SQLite cache of Google Drive folder metadata
+Remembers folder IDs and folder listings between syncs, and keeps the
+listings current from the Drive changes feed instead of re-listing folders
+"""
+import sqlite3
+
+CACHE_FILE = "cache.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    name TEXT NOT NULL,
+    parent_id TEXT NOT NULL,
+    drive_id TEXT NOT NULL,
+    PRIMARY KEY (name, parent_id)
+);
+CREATE TABLE IF NOT EXISTS files (
+    folder_id TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    mime TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    created_time TEXT,
+    modified_time TEXT,
+    PRIMARY KEY (folder_id, file_id)
+);
+CREATE TABLE IF NOT EXISTS page_tokens (
+    folder_id TEXT PRIMARY KEY,
+    page_token TEXT NOT NULL
+);
+"""
+
+CHANGE_FIELDS = (
+    "nextPageToken, newStartPageToken, changes(fileId, removed, "
+    "file(id, name, mimeType, size, createdTime, modifiedTime, parents, trashed))"
+)
+
+
+class DriveCache:
+    """SQLite-backed cache of Drive folder IDs and folder listings"""
+
+    def __init__(self, path=CACHE_FILE, num_retries=0):
+        self.num_retries = num_retries
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def get_folder(self, name, parent_id):
+        """
+        Look up a cached folder ID
+
+        Args:
+            name: Folder name
+            parent_id: Parent folder ID
+
+        Returns:
+            Folder ID if cached, None otherwise
+        """
+        row = self.conn.execute(
+            "SELECT drive_id FROM folders WHERE name = ? AND parent_id = ?",
+            (name, parent_id),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_folder(self, name, parent_id, drive_id):
+        """Cache a folder ID"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO folders (name, parent_id, drive_id) VALUES (?, ?, ?)",
+            (name, parent_id, drive_id),
+        )
+        self.conn.commit()
+
+    def get_folder_files(
+        self, service, folder_id, mime_types, list_folder, created_after=None
+    ):
+        """
+        Return the files in a folder, refreshed from the Drive changes feed
+
+        The first call for a folder records a changes start token and seeds
+        the cache with a full listing; later calls only fetch the changes
+        made since the previous call.
+
+        Args:
+            service: Google Drive service for the account owning the folder
+            folder_id: Folder ID
+            mime_types: MIME types of the files to track
+            list_folder: Callable returning a full listing of the folder
+            created_after: Only return files created after this RFC 3339 UTC
+                timestamp (None = all files)
+
+        Returns:
+            List of file metadata dicts, newest first
+        """
+        row = self.conn.execute(
+            "SELECT page_token FROM page_tokens WHERE folder_id = ?", (folder_id,)
+        ).fetchone()
+
+        if row is None:
+            # Take the token before listing so no change is missed in between
+            page_token = (
+                service.changes()
+                .getStartPageToken(supportsAllDrives=True)
+                .execute(num_retries=self.num_retries)["startPageToken"]
+            )
+            self.conn.execute("DELETE FROM files WHERE folder_id = ?", (folder_id,))
+            for file in list_folder():
+                self._store_file(folder_id, file)
+        else:
+            page_token = self._apply_changes(service, row[0], folder_id, mime_types)
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO page_tokens (folder_id, page_token) VALUES (?, ?)",
+            (folder_id, page_token),
+        )
+        self.conn.commit()
+
+        rows = self.conn.execute(
+            "SELECT file_id, name, mime, size, created_time, modified_time FROM files "
+            "WHERE folder_id = ? AND (? IS NULL OR created_time > ?) "
+            "ORDER BY created_time DESC",
+            (folder_id, created_after, created_after),
+        ).fetchall()
+
+        return [
+            {
+                "id": file_id,
+                "name": name,
+                "mimeType": mime,
+                "size": size,
+                "createdTime": created_time,
+                "modifiedTime": modified_time,
+            }
+            for file_id, name, mime, size, created_time, modified_time in rows
+        ]
+
+    def _apply_changes(self, service, page_token, folder_id, mime_types):
+        """Apply all changes since page_token and return the next start token"""
+        while True:
+            results = (
+                service.changes()
+                .list(
+                    pageToken=page_token,
+                    fields=CHANGE_FIELDS,
+                    pageSize=1000,
+                    supportsAllDrives=True,
+                    includeItemsFromAllDrives=True,
+                )
+                .execute(num_retries=self.num_retries)
+            )
+
+            for change in results.get("changes", []):
+                self._apply_change(change, folder_id, mime_types)
+
+            if "newStartPageToken" in results:
+                return results["newStartPageToken"]
+            page_token = results["nextPageToken"]
+
+    def _apply_change(self, change, folder_id, mime_types):
+        file_id = change["fileId"]
+        file = change.get("file")
+
+        if change.get("removed") or not file or file.get("trashed"):
+            self.conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+            self.conn.execute("DELETE FROM folders WHERE drive_id = ?", (file_id,))
+            return
+
+        parents = file.get("parents", [])
+
+        # Forget cached folders that were moved elsewhere
+        for (parent_id,) in self.conn.execute(
+            "SELECT parent_id FROM folders WHERE drive_id = ?", (file_id,)
+        ).fetchall():
+            if parent_id not in parents:
+                self.conn.execute(
+                    "DELETE FROM folders WHERE drive_id = ? AND parent_id = ?",
+                    (file_id, parent_id),
+                )
+
+        if folder_id in parents and file.get("mimeType") in mime_types:
+            self._store_file(folder_id, file)
+        else:
+            self.conn.execute(
+                "DELETE FROM files WHERE folder_id = ? AND file_id = ?",
+                (folder_id, file_id),
+            )
+
+    def _store_file(self, folder_id, file):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files "
+            "(folder_id, file_id, name, mime, size, created_time, modified_time) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                folder_id,
+                file["id"],
+                file["name"],
+                file.get("mimeType", ""),
+                int(file.get("size") or 0),
+                file.get("createdTime"),
+                file.get("modifiedTime"),
+            ),
+        )
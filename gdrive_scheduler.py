@@ -3,14 +3,43 @@
 Optional scheduler for periodic Google Drive sync
 Runs gdrive_sync.py at specified intervals (minimum 2 hours)
 """
-import schedule
+import signal
+import threading
 import time
-import subprocess
 from datetime import datetime
 
+import gdrive_sync
+
 # Configuration
 SYNC_INTERVAL_HOURS = 2  # Minimum 2 hours, adjust as needed
 
+# Set on Ctrl+C/SIGTERM to wake the scheduler from its sleep and stop it
+stop_event = threading.Event()
+
+
+def request_stop(signum, frame):
+    """Signal handler that stops the scheduler loop"""
+    stop_event.set()
+
+
+def wait_until(deadline):
+    """
+    Sleep until deadline (a time.monotonic() value) or a stop request
+
+    The stop handlers are only installed while sleeping; during a sync the
+    default handlers apply, so Ctrl+C interrupts the running sync itself.
+
+    Returns:
+        bool: True if a stop was requested
+    """
+    previous_sigint = signal.signal(signal.SIGINT, request_stop)
+    previous_sigterm = signal.signal(signal.SIGTERM, request_stop)
+    try:
+        return stop_event.wait(max(0, deadline - time.monotonic()))
+    finally:
+        signal.signal(signal.SIGINT, previous_sigint)
+        signal.signal(signal.SIGTERM, previous_sigterm)
+
 
 def run_sync():
     """Run the sync script"""
@@ -19,16 +48,18 @@ def run_sync():
     print(f"{'='*60}\n")
 
     try:
-        # Run gdrive_sync.py as a subprocess
-        result = subprocess.run(['python', 'gdrive_sync.py'], capture_output=False, text=True)
-
-        if result.returncode == 0:
-            print("\n✓ Sync completed successfully")
-        else:
-            print(f"\n✗ Sync failed with exit code {result.returncode}")
-
+        # Run the sync in-process so imports and auth are reused across ticks
+        exit_code = gdrive_sync.main([])
+    except SystemExit as e:
+        exit_code = e.code
     except Exception as e:
         print(f"\n✗ Error running sync: {str(e)}")
+        return
+
+    if not exit_code:
+        print("\n✓ Sync completed successfully")
+    else:
+        print(f"\n✗ Sync failed with exit code {exit_code}")
 
 
 def main():
@@ -44,20 +75,22 @@ def main():
     print(f"{'='*60}\n")
     print("Press Ctrl+C to stop\n")
 
-    # Schedule the job
-    schedule.every(SYNC_INTERVAL_HOURS).hours.do(run_sync)
-
-    # Run once immediately on startup
-    print("Running initial sync...")
-    run_sync()
+    interval_seconds = SYNC_INTERVAL_HOURS * 3600
+    next_time = time.monotonic() + interval_seconds
 
-    # Keep running
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
+        # Run once immediately on startup
+        print("Running initial sync...")
+        run_sync()
+
+        # Keep running, sleeping until the next sync
+        while not wait_until(next_time):
+            run_sync()
+            next_time = time.monotonic() + interval_seconds
     except KeyboardInterrupt:
-        print("\n\nScheduler stopped by user")
+        pass
+
+    print("\n\nScheduler stopped by user")
 
 
 if __name__ == "__main__":
@@ -6,53 +6,100 @@ transcribes them, and uploads transcripts to another folder (account 2)
 """
 
 import os
+import sys
 import io
 import time
+import random
 import argparse
+import json
+import hashlib
 import subprocess
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import AuthorizedSession, Request
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaInMemoryUpload, build_http
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pickle
 
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 from groq import Groq
 
-# Load environment variables
-load_dotenv()
+from drive_cache import CACHE_FILE, DriveCache
 
 # If modifying these scopes, delete token files
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 
+# Audio MIME types picked up from the source folder
+AUDIO_MIME_TYPES = ("audio/mpeg", "audio/mp3", "audio/wav", "audio/m4a")
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
 # Configuration
 TEMP_DOWNLOAD_DIR = Path("./temp_downloads")
-TEMP_DOWNLOAD_DIR.mkdir(exist_ok=True)
 
-# Groq client
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# Capacity of the queues between pipeline stages (limits files held on disk)
+PIPELINE_QUEUE_SIZE = 2
 
+# Large downloads are split into this many byte ranges fetched in parallel
+DOWNLOAD_CONCURRENCY = 4
+MIN_RANGE_SIZE = 8 * 1024 * 1024  # Don't split below 8MB per range
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
-def get_drive_service(credentials_file, token_file):
+# Timeout in seconds for Drive HTTP requests
+HTTP_TIMEOUT = 30
+
+# Transcripts smaller than this are uploaded in a single request
+SIMPLE_UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+
+# Retries for rate limits (429) and transient server errors. The Groq SDK
+# honours Retry-After and otherwise backs off exponentially with jitter;
+# googleapiclient's num_retries backs off exponentially with jitter too.
+GROQ_MAX_RETRIES = 5
+DRIVE_NUM_RETRIES = 5
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+# Groq client (created by main() with the API key from the current .env)
+groq_client = None
+
+
+# Credentials kept in memory between calls (and scheduler ticks), keyed by
+# token file, plus a digest of the access token last written to each file
+_credentials = {}
+_saved_token_digests = {}
+
+
+def _token_digest(creds):
+    return hashlib.sha1((creds.token or "").encode()).digest()
+
+
+def get_credentials(credentials_file, token_file):
     """
-    Authenticate and return Google Drive service
+    Load, refresh or obtain OAuth2 credentials for a Google account
 
     Args:
         credentials_file: Path to OAuth2 credentials JSON
         token_file: Path to store/load token pickle
 
     Returns:
-        Google Drive service object
+        Google OAuth2 credentials
     """
-    creds = None
+    creds = _credentials.get(token_file)
 
     # Token file stores user's access and refresh tokens
-    if os.path.exists(token_file):
+    if creds is None and os.path.exists(token_file):
         with open(token_file, "rb") as token:
             creds = pickle.load(token)
+        _saved_token_digests[token_file] = _token_digest(creds)
 
     # If no valid credentials, let user log in
     if not creds or not creds.valid:
@@ -62,182 +109,383 @@ def get_drive_service(credentials_file, token_file):
             flow = InstalledAppFlow.from_client_secrets_file(credentials_file, SCOPES)
             creds = flow.run_local_server(port=0)
 
-        # Save credentials for next run
+    _credentials[token_file] = creds
+
+    # Save credentials for next run, but only when the token changed
+    # (this also persists tokens refreshed automatically during requests)
+    digest = _token_digest(creds)
+    if _saved_token_digests.get(token_file) != digest:
         with open(token_file, "wb") as token:
             pickle.dump(creds, token)
+        _saved_token_digests[token_file] = digest
+
+    return creds
+
+
+def reset_credentials():
+    """Forget credentials, services and sessions cached in this process"""
+    _credentials.clear()
+    _saved_token_digests.clear()
+    _thread_local.__dict__.clear()
+
+
+def get_drive_service(credentials_file, token_file):
+    """
+    Authenticate and return Google Drive service
+
+    Args:
+        credentials_file: Path to OAuth2 credentials JSON
+        token_file: Path to store/load token pickle
+
+    Returns:
+        Google Drive service object
+    """
+    creds = get_credentials(credentials_file, token_file)
+
+    # build_http() keeps 308 out of the redirect codes (resumable uploads use
+    # it for "Resume Incomplete"); override its timeout so a stalled request
+    # fails sooner instead of holding up a pipeline stage
+    http = build_http()
+    http.timeout = HTTP_TIMEOUT
+    return build("drive", "v3", http=AuthorizedHttp(creds, http=http))
+
+
+# googleapiclient services (and their httplib2.Http) are not thread-safe,
+# so every thread gets its own service and session per account
+_thread_local = threading.local()
+_auth_lock = threading.Lock()
+
+
+def get_thread_drive_service(credentials_file, token_file):
+    """
+    Return a Google Drive service owned by the calling thread
+
+    Args:
+        credentials_file: Path to OAuth2 credentials JSON
+        token_file: Path to store/load token pickle
+
+    Returns:
+        Google Drive service object
+    """
+    services = getattr(_thread_local, "services", None)
+    if services is None:
+        services = _thread_local.services = {}
+
+    if token_file not in services:
+        # Serialize token refreshes so threads don't race on the pickle file
+        with _auth_lock:
+            services[token_file] = get_drive_service(credentials_file, token_file)
+
+    return services[token_file]
+
+
+def get_thread_authorized_session(credentials_file, token_file):
+    """
+    Return an authorized HTTP session owned by the calling thread
+
+    Args:
+        credentials_file: Path to OAuth2 credentials JSON
+        token_file: Path to store/load token pickle
+
+    Returns:
+        google.auth AuthorizedSession
+    """
+    sessions = getattr(_thread_local, "sessions", None)
+    if sessions is None:
+        sessions = _thread_local.sessions = {}
+
+    if token_file not in sessions:
+        with _auth_lock:
+            session = AuthorizedSession(get_credentials(credentials_file, token_file))
+            retry = Retry(
+                total=DRIVE_NUM_RETRIES,
+                backoff_factor=1,
+                status_forcelist=RETRYABLE_STATUSES,
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            # Keep one pooled connection per parallel download range
+            session.mount(
+                "https://",
+                HTTPAdapter(pool_maxsize=DOWNLOAD_CONCURRENCY, max_retries=retry),
+            )
+            sessions[token_file] = session
 
-    return build("drive", "v3", credentials=creds)
+    return sessions[token_file]
 
 
-def list_audio_files(service, folder_id):
+def list_drive_files(service, query, fields, **kwargs):
+    """
+    Run a files.list query and collect every page of results
+
+    Args:
+        service: Google Drive service
+        query: Drive search query
+        fields: Fields to return for each file, e.g. "id, name"
+        **kwargs: Extra files.list parameters (e.g. orderBy)
+
+    Returns:
+        List of file metadata dicts
+    """
+    files = []
+    page_token = None
+    while True:
+        results = (
+            service.files()
+            .list(
+                q=query,
+                fields=f"nextPageToken, files({fields})",
+                pageSize=1000,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+                **kwargs,
+            )
+            .execute(num_retries=DRIVE_NUM_RETRIES)
+        )
+        files.extend(results.get("files", []))
+
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            break
+
+    return files
+
+
+def list_audio_files(service, folder_id, days_threshold=0, cache=None):
     """
     List all audio files in a Google Drive folder
 
     Args:
         service: Google Drive service
         folder_id: Folder ID to search
+        days_threshold: Only list audio files created in the last N days (0 = all files)
+        cache: Optional DriveCache to serve the listing from
 
     Returns:
         List of file metadata dicts
     """
-    query = f"'{folder_id}' in parents and (mimeType='audio/mpeg' or mimeType='audio/mp3' or mimeType='audio/wav' or mimeType='audio/m4a') and trashed=false"
-
-    results = (
-        service.files()
-        .list(
-            q=query,
-            fields="files(id, name, mimeType, size, createdTime, modifiedTime, properties)",
-            orderBy="createdTime desc",
+    created_after = None
+    if days_threshold > 0:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days_threshold)
+        created_after = cutoff.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    if cache is not None:
+        # The cache always holds the full listing so --days can change between runs
+        return cache.get_folder_files(
+            service,
+            folder_id,
+            AUDIO_MIME_TYPES,
+            lambda: list_audio_files(service, folder_id),
+            created_after,
         )
-        .execute()
+
+    mime_query = " or ".join(f"mimeType='{mime}'" for mime in AUDIO_MIME_TYPES)
+    query = (
+        f"'{folder_id}' in parents and ({mime_query}) "
+        f"and mimeType != '{FOLDER_MIME_TYPE}' and trashed=false"
     )
 
-    return results.get("files", [])
+    # Let Drive skip files older than the threshold
+    if created_after:
+        query += f" and createdTime > '{created_after}'"
 
+    return list_drive_files(
+        service,
+        query,
+        "id, name, mimeType, size, createdTime, modifiedTime, properties",
+        orderBy="createdTime desc",
+    )
 
-def find_transcription_file(service, folder_id, audio_filename):
+
+def list_transcript_files(service, folder_id):
     """
-    Check if a transcription (.txt) file exists for an audio file
+    List all transcription (.txt) files in a Google Drive folder
 
     Args:
         service: Google Drive service
         folder_id: Destination folder ID
-        audio_filename: Name of the audio file
 
     Returns:
-        File metadata dict if found, None otherwise
+        List of file metadata dicts
     """
-    # Generate expected transcription filename
-    transcript_filename = Path(audio_filename).stem + ".txt"
-
-    query = f"'{folder_id}' in parents and name='{transcript_filename}' and mimeType='text/plain' and trashed=false"
+    query = f"'{folder_id}' in parents and mimeType='text/plain' and trashed=false"
 
-    results = (
-        service.files().list(q=query, fields="files(id, name, modifiedTime)").execute()
+    return list_drive_files(
+        service, query, "id, name, mimeType, createdTime, modifiedTime"
     )
 
-    files = results.get("files", [])
-    return files[0] if files else None
 
+def list_all_transcripts(service, folder_id, cache=None):
+    """
+    List the names of all transcription (.txt) files in a Google Drive folder
+
+    Args:
+        service: Google Drive service
+        folder_id: Destination folder ID
+        cache: Optional DriveCache to serve the listing from
+
+    Returns:
+        Set of transcript filenames
+    """
+    if cache is not None:
+        files = cache.get_folder_files(
+            service,
+            folder_id,
+            ("text/plain",),
+            lambda: list_transcript_files(service, folder_id),
+        )
+    else:
+        files = list_transcript_files(service, folder_id)
+
+    return set(f["name"] for f in files)
 
-def needs_transcription(service, dest_folder_id, audio_file, days_threshold):
+
+def needs_transcription(audio_file, transcript_names):
     """
     Check if an audio file needs transcription.
 
-    Logic:
-      1. If days_threshold > 0, skip audio files created more than N days ago.
-      2. Skip audio files that already have a matching .txt transcript.
+    Audio files that already have a matching .txt transcript are skipped;
+    the date filter is applied when listing the audio files.
 
     Args:
-        service: Google Drive service for destination folder
-        dest_folder_id: Destination folder ID
         audio_file: Audio file metadata dict
-        days_threshold: Only process audio files created in the last N days (0 = all files)
+        transcript_names: Set of transcript filenames in the destination folder
 
     Returns:
         bool: True if file needs transcription, False otherwise
     """
-    # Filter by audio file creation date
-    if days_threshold > 0:
-        created_time_str = audio_file.get("createdTime", "")
-        if created_time_str:
-            # Handle 'Z' timezone indicator (UTC)
-            if created_time_str.endswith("Z"):
-                created_time_str = created_time_str[:-1] + "+00:00"
-
-            file_created = datetime.fromisoformat(created_time_str)
-
-            # Calculate threshold date
-            if file_created.tzinfo:
-                threshold_date = datetime.now(file_created.tzinfo) - timedelta(
-                    days=days_threshold
-                )
-            else:
-                threshold_date = datetime.utcnow() - timedelta(days=days_threshold)
-
-            # Skip files created before the threshold
-            if file_created < threshold_date:
-                return False
-
-    # Check if a transcript already exists
-    transcript_file = find_transcription_file(
-        service, dest_folder_id, audio_file["name"]
-    )
+    return Path(audio_file["name"]).stem + ".txt" not in transcript_names
 
-    # If transcript already exists, skip
-    if transcript_file:
-        return False
 
-    # Audio file is recent enough and has no transcript
-    return True
-
-
-def download_file(service, file_id, destination_path):
+def download_file(service, session, file_id, destination_path, file_size=None):
     """
     Download a file from Google Drive
 
+    Files of at least 2 * MIN_RANGE_SIZE are fetched as DOWNLOAD_CONCURRENCY
+    HTTP Range requests in parallel, each written at its offset into a
+    preallocated file, so the link never waits on a single request's RTT.
+
     Args:
-        service: Google Drive service
+        service: Google Drive service (used to build the media URL)
+        session: AuthorizedSession for the same account
         file_id: ID of file to download
         destination_path: Local path to save file
+        file_size: Size in bytes from the file metadata (None = unknown)
     """
-    request = service.files().get_media(fileId=file_id)
+    url = service.files().get_media(fileId=file_id, supportsAllDrives=True).uri
+    file_name = Path(destination_path).name
+
+    def fetch_range(start, end):
+        """Fetch bytes start..end (inclusive, None = to EOF) into the file"""
+        headers = {"Range": f"bytes={start}-{end}"} if end is not None else {}
+        with session.get(
+            url, headers=headers, stream=True, timeout=HTTP_TIMEOUT
+        ) as response:
+            response.raise_for_status()
+            if headers and response.status_code != 206:
+                raise Exception("Server ignored the Range request")
+
+            # Each range writes through its own file object at its own offset
+            with open(destination_path, "r+b") as fh:
+                fh.seek(start)
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    fh.write(chunk)
+                return fh.tell() - start
 
     with open(destination_path, "wb") as fh:
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            if status:
-                print(f"  Download progress: {int(status.progress() * 100)}%")
+        if file_size and file_size >= 2 * MIN_RANGE_SIZE:
+            # Preallocate so every range can be written at its own offset
+            fh.truncate(file_size)
+
+    if not file_size or file_size < 2 * MIN_RANGE_SIZE:
+        fetch_range(0, None)
+        return
+
+    range_count = min(DOWNLOAD_CONCURRENCY, file_size // MIN_RANGE_SIZE)
+    range_size = -(-file_size // range_count)
+    ranges = [
+        (start, min(start + range_size, file_size) - 1)
+        for start in range(0, file_size, range_size)
+    ]
+
+    downloaded = 0
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [executor.submit(fetch_range, start, end) for start, end in ranges]
+        for future in as_completed(futures):
+            downloaded += future.result()
+            print(
+                f"[{file_name}] Download progress: "
+                f"{int(downloaded / file_size * 100)}%"
+            )
+
+    if downloaded != file_size:
+        raise Exception(
+            f"Incomplete download ({downloaded} of {file_size} bytes)"
+        )
 
 
-def upload_file(service, file_path, folder_id, filename=None):
+def upload_text(service, text, folder_id, filename):
     """
-    Upload a file to Google Drive
+    Upload text to Google Drive as a plain text file, without a local copy
 
     Args:
         service: Google Drive service
-        file_path: Local file path to upload
+        text: File contents
         folder_id: Destination folder ID
-        filename: Optional custom filename
+        filename: Name of the file to create
 
     Returns:
         Uploaded file ID
     """
-    if filename is None:
-        filename = Path(file_path).name
-
     file_metadata = {"name": filename, "parents": [folder_id]}
 
-    media = MediaFileUpload(file_path, resumable=True)
+    data = text.encode("utf-8")
+    media = MediaInMemoryUpload(
+        data,
+        mimetype="text/plain",
+        resumable=len(data) >= SIMPLE_UPLOAD_MAX_SIZE,
+    )
 
     file = (
         service.files()
-        .create(body=file_metadata, media_body=media, fields="id")
-        .execute()
+        .create(
+            body=file_metadata,
+            media_body=media,
+            fields="id",
+            supportsAllDrives=True,
+        )
+        .execute(num_retries=DRIVE_NUM_RETRIES)
     )
 
     return file.get("id")
 
 
-def get_or_create_processed_folder(service, parent_folder_id):
+def get_or_create_processed_folder(service, parent_folder_id, cache=None):
     """
     Get or create a 'processed' subfolder in the parent folder
 
     Args:
         service: Google Drive service
         parent_folder_id: Parent folder ID
+        cache: Optional DriveCache remembering the folder ID between syncs
 
     Returns:
         Processed folder ID
     """
-    # Search for existing 'processed' folder
-    query = f"name='processed' and '{parent_folder_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
+    if cache is not None:
+        folder_id = cache.get_folder("processed", parent_folder_id)
+        if folder_id:
+            return folder_id
+
+        folder_id = get_or_create_processed_folder(service, parent_folder_id)
+        cache.set_folder("processed", parent_folder_id, folder_id)
+        return folder_id
 
-    results = service.files().list(q=query, fields="files(id, name)").execute()
+    # Search for existing 'processed' folder
+    query = f"name='processed' and '{parent_folder_id}' in parents and mimeType='{FOLDER_MIME_TYPE}' and trashed=false"
 
-    folders = results.get("files", [])
+    folders = list_drive_files(service, query, "id, name")
 
     if folders:
         return folders[0]["id"]
@@ -245,79 +493,278 @@ def get_or_create_processed_folder(service, parent_folder_id):
     # Create 'processed' folder if it doesn't exist
     file_metadata = {
         "name": "processed",
-        "mimeType": "application/vnd.google-apps.folder",
+        "mimeType": FOLDER_MIME_TYPE,
         "parents": [parent_folder_id],
     }
 
-    folder = service.files().create(body=file_metadata, fields="id").execute()
+    folder = (
+        service.files()
+        .create(body=file_metadata, fields="id", supportsAllDrives=True)
+        .execute(num_retries=DRIVE_NUM_RETRIES)
+    )
 
     print(f"  Created 'processed' subfolder")
     return folder.get("id")
 
 
-def move_to_processed(
-    service, file_id, file_name, source_folder_id, processed_folder_id
-):
+# Number of moves sent per Drive batch request (Drive allows up to 100)
+MOVE_BATCH_SIZE = 50
+
+
+def move_to_processed(service, files, source_folder_id, processed_folder_id):
     """
-    Move a file to the 'processed' subfolder
+    Move files to the 'processed' subfolder using a single batch request
 
     Args:
         service: Google Drive service
-        file_id: File ID to move
-        file_name: File name (for display)
+        files: List of (file_id, file_name) tuples to move
         source_folder_id: Current parent folder ID
         processed_folder_id: Destination 'processed' folder ID
+
+    Returns:
+        Number of files that failed to move
     """
-    # Remove file from source folder and add to processed folder
-    service.files().update(
-        fileId=file_id,
-        addParents=processed_folder_id,
-        removeParents=source_folder_id,
-        fields="id, parents",
-    ).execute()
+    if not files:
+        return 0
+
+    names = dict(files)
+    pending = list(names)
+    failed = []
+
+    # Batched requests aren't covered by num_retries, so retry
+    # rate-limited/transient failures with exponential backoff and jitter
+    for attempt in range(DRIVE_NUM_RETRIES + 1):
+        if attempt:
+            time.sleep(random.uniform(0, 2**attempt))
+
+        can_retry = attempt < DRIVE_NUM_RETRIES
+        resolved = set()
+        retry = []
+
+        def callback(request_id, response, exception):
+            file_name = names[request_id]
+            resolved.add(request_id)
+            if exception is None:
+                print(f"  Moved '{file_name}' to 'processed' subfolder")
+            elif (
+                can_retry
+                and isinstance(exception, HttpError)
+                and exception.resp.status in RETRYABLE_STATUSES
+            ):
+                retry.append(request_id)
+            else:
+                print(f"  ✗ Failed to move '{file_name}' to 'processed': {exception}")
+                failed.append(request_id)
+
+        batch = service.new_batch_http_request(callback=callback)
+        for file_id in pending:
+            # Remove file from source folder and add to processed folder
+            batch.add(
+                service.files().update(
+                    fileId=file_id,
+                    addParents=processed_folder_id,
+                    removeParents=source_folder_id,
+                    fields="id",
+                    supportsAllDrives=True,
+                ),
+                request_id=file_id,
+            )
+
+        try:
+            batch.execute()
+        except (HttpError, httplib2.HttpLib2Error, OSError) as e:
+            # The whole batch failed; re-queue everything not yet handled
+            unresolved = [file_id for file_id in pending if file_id not in resolved]
+            if can_retry:
+                retry.extend(unresolved)
+            else:
+                for file_id in unresolved:
+                    print(f"  ✗ Failed to move '{names[file_id]}' to 'processed': {e}")
+                    failed.append(file_id)
+
+        pending = retry
+        if not pending:
+            break
 
-    print(f"  Moved '{file_name}' to 'processed' subfolder")
+    return len(failed)
 
 
 # Groq API file size limit (25MB)
 MAX_FILE_SIZE = 25 * 1024 * 1024
 
+# Codecs that can be copied without re-encoding, and the container to use
+# (only MP3 is listed: AUDIO_MIME_TYPES has no Ogg/Opus files)
+REMUX_SUFFIXES = {"mp3": ".mp3"}
 
-def compress_audio(input_path, output_path):
+
+def probe_audio(input_path):
     """
-    Compress audio file using ffmpeg to fit within Groq's 25MB limit
+    Read the codec, bitrate and duration of an audio file with ffprobe
 
     Args:
-        input_path: Path to input audio file
-        output_path: Path to output compressed file
+        input_path: Path to audio file
 
     Returns:
-        bool: True if successful
+        dict with codec_name, bit_rate (bits/s) and duration (seconds),
+        or None if the file could not be probed
     """
-    try:
-        # Use ffmpeg to compress audio to smaller size
-        # -ar 16000: Set sample rate to 16kHz (sufficient for speech)
-        # -ac 1: Convert to mono
-        # -b:a 32k: Set audio bitrate to 32kbps
-        cmd = [
-            "ffmpeg", "-i", str(input_path),
-            "-ar", "16000",
-            "-ac", "1",
-            "-b:a", "32k",
-            "-y",  # Overwrite output file if exists
-            str(output_path)
-        ]
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name,sample_rate,channels,bit_rate:format=duration",
+        "-of", "json",
+        str(input_path)
+    ]
 
+    try:
         result = subprocess.run(cmd, capture_output=True, text=True)
-        return result.returncode == 0
+    except FileNotFoundError:
+        return None
+    if result.returncode != 0:
+        return None
+
+    info = json.loads(result.stdout)
+    streams = info.get("streams", [])
+    if not streams:
+        return None
+
+    return {
+        "codec_name": streams[0].get("codec_name"),
+        "bit_rate": int(streams[0].get("bit_rate") or 0),
+        "duration": float(info.get("format", {}).get("duration") or 0),
+    }
+
+
+def compress_audio(input_path, output_path, remux=True):
+    """
+    Start compressing an audio file using ffmpeg to fit within Groq's 25MB limit
+
+    ffmpeg runs in the background; call communicate() on the returned process
+    before using the output file.
+
+    Args:
+        input_path: Path to input audio file
+        output_path: Path to output compressed file (its suffix is replaced
+            to match the output codec)
+        remux: Copy the audio stream without re-encoding when it looks small
+            enough (False = always re-encode)
+
+    Returns:
+        (subprocess.Popen running ffmpeg or None if it could not be started,
+        path of the output file)
+    """
+    try:
+        probe = probe_audio(input_path)
+        if (
+            remux
+            and probe
+            and probe["codec_name"] in REMUX_SUFFIXES
+            and 0 < probe["bit_rate"] * probe["duration"] / 8 < MAX_FILE_SIZE
+        ):
+            # The audio stream itself fits (the excess is video/cover art/tags),
+            # so copy it into a matching container instead of re-encoding
+            suffix = REMUX_SUFFIXES[probe["codec_name"]]
+            output_path = Path(output_path).with_suffix(suffix)
+            print("  Audio stream already fits the limit, remuxing without re-encoding...")
+            cmd = [
+                "ffmpeg", "-v", "error", "-i", str(input_path),
+                "-map", "0:a:0",
+                "-c:a", "copy",
+                "-y",  # Overwrite output file if exists
+                str(output_path)
+            ]
+        else:
+            output_path = Path(output_path).with_suffix(".ogg")
+
+            # Use ffmpeg to compress audio to smaller size
+            # -ar 16000: Set sample rate to 16kHz (sufficient for speech)
+            # -ac 1: Convert to mono
+            # -c:a libopus -b:a 12k: Opus at 12kbps (~4.5 hours fit in 25MB)
+            # -application voip -vbr on -frame_duration 60: Tune for speech
+            # -threads 0: Let ffmpeg use all cores
+            cmd = [
+                "ffmpeg", "-v", "error", "-i", str(input_path),
+                "-ar", "16000",
+                "-ac", "1",
+                "-c:a", "libopus",
+                "-b:a", "12k",
+                "-application", "voip",
+                "-vbr", "on",
+                "-frame_duration", "60",
+                "-threads", "0",
+                "-y",  # Overwrite output file if exists
+                str(output_path)
+            ]
+
+        # Keep ffmpeg off the terminal (it reads keystrokes from a tty stdin)
+        # and collect only its errors
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        return process, output_path
     except FileNotFoundError:
         print("  Error: ffmpeg not found. Please install ffmpeg:")
         print("    macOS: brew install ffmpeg")
         print("    Ubuntu/Debian: sudo apt-get install ffmpeg")
-        return False
+        return None, Path(output_path)
     except Exception as e:
         print(f"  Error compressing audio: {e}")
-        return False
+        return None, Path(output_path)
+
+
+def start_compression(audio_path):
+    """
+    Start compressing an audio file in the background if it exceeds Groq's 25MB limit
+
+    Args:
+        audio_path: Path to audio file
+
+    Returns:
+        (ffmpeg process or None, compressed file path), or None if the file
+        is small enough to send as is
+    """
+    audio_path = Path(audio_path)
+
+    file_size = audio_path.stat().st_size
+    if file_size <= MAX_FILE_SIZE:
+        return None
+
+    file_size_mb = file_size / (1024 * 1024)
+    print(f"  File exceeds 25MB limit ({file_size_mb:.1f} MB). Compressing with ffmpeg...")
+    temp_compressed_file = audio_path.parent / f"temp_compressed_{audio_path.name}"
+
+    return compress_audio(audio_path, temp_compressed_file)
+
+
+def wait_for_compression(audio_path, process, output_path):
+    """
+    Wait for a compress_audio() ffmpeg process to finish
+
+    Args:
+        audio_path: Path to the audio file being compressed
+        process: ffmpeg process from compress_audio() (None = failed to start)
+        output_path: Path of the compressed file
+
+    Returns:
+        Size of the compressed file in bytes
+    """
+    if process is None:
+        raise Exception(f"Failed to compress {audio_path.name} with ffmpeg")
+
+    _, ffmpeg_errors = process.communicate()
+    if process.returncode != 0:
+        raise Exception(
+            f"Failed to compress {audio_path.name} with ffmpeg "
+            f"(exit code {process.returncode}): {ffmpeg_errors.strip()}"
+        )
+
+    compressed_size = output_path.stat().st_size
+    print(f"  Compressed to {compressed_size / (1024 * 1024):.1f} MB")
+    return compressed_size
 
 
 def transcribe_with_local_whisper(audio_path):
@@ -339,13 +786,15 @@ def transcribe_with_local_whisper(audio_path):
     return result["text"]
 
 
-def transcribe_audio_file(audio_path):
+def transcribe_audio_file(audio_path, compression=None):
     """
     Transcribe audio file using Groq API, falling back to local Whisper large-v2.
     Compresses large files with ffmpeg before sending to Groq.
 
     Args:
         audio_path: Path to audio file
+        compression: Result of start_compression() if it was already called
+            for this file, so ffmpeg could run while other work happened
 
     Returns:
         Transcription text
@@ -356,21 +805,34 @@ def transcribe_audio_file(audio_path):
 
     # Try Groq API first
     try:
-        # Check if file exceeds Groq's 25MB limit
-        file_size = audio_path.stat().st_size
-        if file_size > MAX_FILE_SIZE:
-            file_size_mb = file_size / (1024 * 1024)
-            print(f"  File exceeds 25MB limit ({file_size_mb:.1f} MB). Compressing with ffmpeg...")
-            temp_compressed_file = audio_path.parent / f"temp_compressed_{audio_path.name}"
-            temp_compressed_file = temp_compressed_file.with_suffix('.mp3')
-
-            if not compress_audio(audio_path, temp_compressed_file):
-                raise Exception("Failed to compress audio file with ffmpeg")
-
-            compressed_size = temp_compressed_file.stat().st_size
-            compressed_size_mb = compressed_size / (1024 * 1024)
-            print(f"  Compressed to {compressed_size_mb:.1f} MB")
+        # Compress if file exceeds Groq's 25MB limit
+        if compression is None:
+            compression = start_compression(audio_path)
 
+        if compression is not None:
+            process, temp_compressed_file = compression
+
+            # Only block on ffmpeg right before the compressed file is needed
+            compressed_size = wait_for_compression(
+                audio_path, process, temp_compressed_file
+            )
+
+            # ffprobe's bitrate is only an estimate for VBR MP3s without a
+            # Xing header, so a copied stream can still be too large
+            if (
+                compressed_size > MAX_FILE_SIZE
+                and temp_compressed_file.suffix in REMUX_SUFFIXES.values()
+            ):
+                print("  Remuxed audio is still too large, re-encoding...")
+                temp_compressed_file.unlink()
+                process, temp_compressed_file = compress_audio(
+                    audio_path, temp_compressed_file, remux=False
+                )
+                compressed_size = wait_for_compression(
+                    audio_path, process, temp_compressed_file
+                )
+
+            compressed_size_mb = compressed_size / (1024 * 1024)
             if compressed_size > MAX_FILE_SIZE:
                 raise Exception(f"File still too large after compression ({compressed_size_mb:.1f} MB)")
 
@@ -378,9 +840,9 @@ def transcribe_audio_file(audio_path):
 
         print(f"  Transcribing with Groq Whisper Large V3...")
 
-        with open(file_to_transcribe, "rb") as audio_file:
+        with open(file_to_transcribe, "rb", buffering=1024 * 1024) as audio_file:
             transcription = groq_client.audio.transcriptions.create(
-                file=(file_to_transcribe.name, audio_file.read()),
+                file=(file_to_transcribe.name, audio_file),
                 model="whisper-large-v3",
                 response_format="verbose_json",
                 temperature=0.0,
@@ -400,17 +862,28 @@ def transcribe_audio_file(audio_path):
 
 
 def process_files(
-    source_service, source_folder_id, dest_service, dest_folder_id, days_threshold=0
+    source_auth,
+    source_folder_id,
+    dest_auth,
+    dest_folder_id,
+    days_threshold=0,
+    cache=None,
 ):
     """
     Main processing function: download, transcribe, upload, move to processed
 
+    The stages run as a pipeline connected by bounded queues, so the next
+    file downloads while the current one is transcribed and the previous
+    one is uploaded. Transcription stays single-threaded to avoid Groq
+    rate limits; moves are batched on the calling thread.
+
     Args:
-        source_service: Google Drive service for account 1 (source)
+        source_auth: (credentials_file, token_file) for account 1 (source)
         source_folder_id: Source folder ID
-        dest_service: Google Drive service for account 2 (destination)
+        dest_auth: (credentials_file, token_file) for account 2 (destination)
         dest_folder_id: Destination folder ID
         days_threshold: Only process files not transcribed in last N days (0 = all files)
+        cache: Optional DriveCache for folder IDs and folder listings
     """
     print(f"\n{'=' * 60}")
     print(f"Starting sync at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -422,107 +895,219 @@ def process_files(
         print(f"Filter: All files without a transcript")
     print(f"{'=' * 60}\n")
 
-    # Get or create 'processed' subfolder
-    print("Setting up 'processed' subfolder...")
-    processed_folder_id = get_or_create_processed_folder(
-        source_service, source_folder_id
-    )
+    source_service = get_thread_drive_service(*source_auth)
+    dest_service = get_thread_drive_service(*dest_auth)
 
-    # List audio files in source folder (excluding processed subfolder)
+    # List audio files in source folder (excluding processed subfolder).
+    # With the cache this also applies changes to the cached 'processed' folder,
+    # so it must run before the folder is looked up.
     print("Fetching audio files from source folder...")
-    all_files = list_audio_files(source_service, source_folder_id)
+    all_files = list_audio_files(
+        source_service, source_folder_id, days_threshold, cache
+    )
 
     if not all_files:
         print("No audio files found in source folder.")
         return
 
-    print(f"Found {len(all_files)} total audio file(s)")
+    print(f"Found {len(all_files)} audio file(s)")
 
     # Filter files that need transcription
     print(f"Filtering files...")
+    transcript_names = list_all_transcripts(dest_service, dest_folder_id, cache)
     files = [
         f
         for f in all_files
-        if needs_transcription(dest_service, dest_folder_id, f, days_threshold)
+        if needs_transcription(f, transcript_names)
     ]
     skipped_count = len(all_files) - len(files)
     if skipped_count > 0:
         print(
-            f"Skipped {skipped_count} file(s) (too old or already transcribed)"
+            f"Skipped {skipped_count} file(s) (already transcribed)"
         )
 
     if not files:
         print("No files need transcription.")
         return
 
+    # Get or create 'processed' subfolder (no API call once it is cached)
+    print("Setting up 'processed' subfolder...")
+    processed_folder_id = get_or_create_processed_folder(
+        source_service, source_folder_id, cache
+    )
+
     print(f"Processing {len(files)} file(s) that need transcription\n")
 
     processed_count = 0
     error_count = 0
-    local_audio_path = None
-    local_transcript_path = None
+    counts_lock = threading.Lock()
+
+    to_transcribe = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    to_upload = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    to_move = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
 
-    for file in files:
-        file_name = file["name"]
-        file_id = file["id"]
-        file_size_mb = int(file.get("size", 0)) / (1024 * 1024)
+    # Output from concurrent stages interleaves, so tag every line
+    def log(file, message):
+        print(f"[{file['name']}] {message}")
 
-        print(f"\n{'-' * 60}")
-        print(f"File: {file_name}")
-        print(f"Size: {file_size_mb:.2f} MB")
+    def fail(file, error, *local_paths):
+        """Record a failed file and clean up its partial local files"""
+        nonlocal error_count
+
+        log(file, f"✗ Error processing {file['name']}: {str(error)}")
+        with counts_lock:
+            error_count += 1
 
+        for local_path in local_paths:
+            if local_path and local_path.exists():
+                local_path.unlink()
+
+    def downloader():
+        """Pipeline stage 1: download audio files from the source folder"""
         try:
-            # Download file
-            print("Downloading...")
-            local_audio_path = TEMP_DOWNLOAD_DIR / file_name
-            download_file(source_service, file_id, local_audio_path)
-
-            # Transcribe
-            print("Transcribing...")
-            transcript_text = transcribe_audio_file(local_audio_path)
-
-            # Save transcript locally
-            transcript_filename = Path(file_name).stem + ".txt"
-            local_transcript_path = TEMP_DOWNLOAD_DIR / transcript_filename
-            local_transcript_path.write_text(transcript_text)
-
-            print(f"Transcription complete ({len(transcript_text)} characters)")
-
-            # Upload transcript to destination folder
-            print("Uploading transcript to destination folder...")
-            uploaded_file_id = upload_file(
-                dest_service, local_transcript_path, dest_folder_id, transcript_filename
-            )
-            print(f"Uploaded successfully (ID: {uploaded_file_id})")
-
-            # Move source file to 'processed' subfolder
-            print("Moving source file to 'processed' subfolder...")
-            move_to_processed(
-                source_service,
-                file_id,
-                file_name,
-                source_folder_id,
-                processed_folder_id,
-            )
+            for file in files:
+                # Drive allows duplicate names, so key local files on the file ID
+                local_audio_path = TEMP_DOWNLOAD_DIR / (
+                    file["id"] + Path(file["name"]).suffix
+                )
+                file_size_mb = int(file.get("size", 0)) / (1024 * 1024)
+
+                try:
+                    service = get_thread_drive_service(*source_auth)
+                    session = get_thread_authorized_session(*source_auth)
+                    log(file, f"Downloading ({file_size_mb:.2f} MB)...")
+                    download_file(
+                        service,
+                        session,
+                        file["id"],
+                        local_audio_path,
+                        int(file.get("size", 0)),
+                    )
+
+                    # Start ffmpeg now so it runs while the next file downloads
+                    compression = start_compression(local_audio_path)
+                except Exception as e:
+                    fail(file, e, local_audio_path)
+                    continue
+
+                to_transcribe.put((file, local_audio_path, compression))
+        finally:
+            to_transcribe.put(None)
+
+    def transcriber():
+        """Pipeline stage 2: transcribe downloaded files, one at a time"""
+        try:
+            while True:
+                item = to_transcribe.get()
+                if item is None:
+                    break
+
+                file, local_audio_path, compression = item
+
+                try:
+                    log(file, "Transcribing...")
+                    transcript_text = transcribe_audio_file(
+                        local_audio_path, compression
+                    )
+                    log(
+                        file,
+                        f"Transcription complete ({len(transcript_text)} characters)",
+                    )
+
+                    local_audio_path.unlink()
+                except Exception as e:
+                    fail(file, e, local_audio_path)
+                    continue
+
+                to_upload.put((file, transcript_text))
+        finally:
+            to_upload.put(None)
+
+    def uploader():
+        """Pipeline stage 3: upload transcripts to the destination folder"""
+        try:
+            while True:
+                item = to_upload.get()
+                if item is None:
+                    break
+
+                file, transcript_text = item
+                transcript_filename = Path(file["name"]).stem + ".txt"
+
+                try:
+                    service = get_thread_drive_service(*dest_auth)
+                    log(file, "Uploading transcript to destination folder...")
+                    uploaded_file_id = upload_text(
+                        service, transcript_text, dest_folder_id, transcript_filename
+                    )
+                    log(file, f"Uploaded successfully (ID: {uploaded_file_id})")
+                except Exception as e:
+                    fail(file, e)
+                    continue
+
+                to_move.put(file)
+        finally:
+            to_move.put(None)
+
+    stages = [
+        threading.Thread(target=stage, name=stage.__name__, daemon=True)
+        for stage in (downloader, transcriber, uploader)
+    ]
+    for stage in stages:
+        stage.start()
 
-            # Clean up local files
-            local_audio_path.unlink()
-            local_transcript_path.unlink()
+    # Move source files to 'processed' in batches as they come out of the pipeline
+    pending_moves = []
 
-            processed_count += 1
-            print("✓ Complete")
+    def flush_moves():
+        """Move all queued source files to 'processed' in one batch"""
+        nonlocal processed_count, error_count
 
+        if not pending_moves:
+            return
+
+        print(
+            f"Moving {len(pending_moves)} source file(s) to 'processed' subfolder..."
+        )
+        try:
+            move_errors = move_to_processed(
+                source_service, pending_moves, source_folder_id, processed_folder_id
+            )
         except Exception as e:
-            print(f"✗ Error processing {file_name}: {str(e)}")
-            error_count += 1
+            # Keep draining the pipeline so the stage threads can finish
+            print(f"✗ Error moving files to 'processed': {str(e)}")
+            move_errors = len(pending_moves)
+
+        # A file only counts as processed once it has been moved
+        with counts_lock:
+            processed_count += len(pending_moves) - move_errors
+            error_count += move_errors
+        pending_moves.clear()
 
-            # Clean up partial downloads
-            if local_audio_path and local_audio_path.exists():
-                local_audio_path.unlink()
-            if local_transcript_path and local_transcript_path.exists():
-                local_transcript_path.unlink()
+    try:
+        while True:
+            file = to_move.get()
+            if file is None:
+                break
+
+            pending_moves.append((file["id"], file["name"]))
+            if len(pending_moves) >= MOVE_BATCH_SIZE:
+                flush_moves()
+    finally:
+        # Uploaded files are skipped by later syncs, so on Ctrl+C or an error
+        # still move every file uploaded so far instead of stranding it
+        while True:
+            try:
+                file = to_move.get_nowait()
+            except queue.Empty:
+                break
+            if file is not None:
+                pending_moves.append((file["id"], file["name"]))
 
-            continue
+        flush_moves()
+
+    for stage in stages:
+        stage.join()
 
     print(f"\n{'=' * 60}")
     print(f"Sync complete at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -530,8 +1115,16 @@ def process_files(
     print(f"{'=' * 60}\n")
 
 
-def main():
-    """Main entry point"""
+def main(argv=None):
+    """
+    Main entry point
+
+    Args:
+        argv: Command line arguments (default: sys.argv[1:])
+
+    Returns:
+        int: Exit code (0 on success)
+    """
     # Parse command line arguments
     parser = argparse.ArgumentParser(
         description="Sync audio files from Google Drive Account 1, transcribe them, and upload to Account 2",
@@ -549,20 +1142,35 @@ Examples:
         default=7,
         help="Only process audio files created in the last N days (default: 7, use 0 for all files)",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Re-list both folders instead of using the local {CACHE_FILE} cache",
+    )
     parser.add_argument(
         "--reset-auth",
         action="store_true",
         help="Reset authentication and re-authenticate both Google Drive accounts",
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if args.days < 0:
         print("Error: --days must be >= 0")
-        return
+        return 1
+
+    # Re-read .env on every run, since the scheduler calls main() for each
+    # sync; variables set in the real environment still take precedence
+    config = {**dotenv_values(), **os.environ}
+
+    global groq_client
+    groq_client = Groq(api_key=config.get("GROQ_API_KEY"), max_retries=GROQ_MAX_RETRIES)
+
+    TEMP_DOWNLOAD_DIR.mkdir(exist_ok=True)
 
     # Handle reset auth flag
     if args.reset_auth:
         print("Resetting authentication...")
+        reset_credentials()
         SOURCE_TOKEN = "token_account1.pickle"
         DEST_TOKEN = "token_account2.pickle"
 
@@ -573,6 +1181,10 @@ Examples:
         if os.path.exists(DEST_TOKEN):
             os.remove(DEST_TOKEN)
             tokens_removed.append(DEST_TOKEN)
+        # Cached folder IDs and listings belong to the old accounts
+        if os.path.exists(CACHE_FILE):
+            os.remove(CACHE_FILE)
+            tokens_removed.append(CACHE_FILE)
 
         if tokens_removed:
             print(f"  Removed: {', '.join(tokens_removed)}")
@@ -583,44 +1195,59 @@ Examples:
     # Configuration - Update these values
     SOURCE_CREDENTIALS = "credentials_account1.json"  # OAuth2 credentials for account 1
     SOURCE_TOKEN = "token_account1.pickle"  # Token storage for account 1
-    SOURCE_FOLDER_ID = os.getenv("SOURCE_FOLDER_ID")  # Folder ID in account 1
+    SOURCE_FOLDER_ID = config.get("SOURCE_FOLDER_ID")  # Folder ID in account 1
 
     DEST_CREDENTIALS = "credentials_account2.json"  # OAuth2 credentials for account 2
     DEST_TOKEN = "token_account2.pickle"  # Token storage for account 2
-    DEST_FOLDER_ID = os.getenv("DEST_FOLDER_ID")  # Folder ID in account 2
+    DEST_FOLDER_ID = config.get("DEST_FOLDER_ID")  # Folder ID in account 2
 
     # Validate configuration
     if not SOURCE_FOLDER_ID or not DEST_FOLDER_ID:
         print("Error: Please set SOURCE_FOLDER_ID and DEST_FOLDER_ID in .env file")
-        return
+        return 1
 
     if not os.path.exists(SOURCE_CREDENTIALS):
         print(
             f"Error: {SOURCE_CREDENTIALS} not found. Please download OAuth2 credentials."
         )
         print("See GOOGLE_CLOUD_SETUP.md for instructions.")
-        return
+        return 1
 
     if not os.path.exists(DEST_CREDENTIALS):
         print(
             f"Error: {DEST_CREDENTIALS} not found. Please download OAuth2 credentials."
         )
         print("See GOOGLE_CLOUD_SETUP.md for instructions.")
-        return
+        return 1
 
     # Authenticate both accounts
     print("Authenticating with Google Drive accounts...")
-    source_service = get_drive_service(SOURCE_CREDENTIALS, SOURCE_TOKEN)
+    source_auth = (SOURCE_CREDENTIALS, SOURCE_TOKEN)
+    get_thread_drive_service(*source_auth)
     print("✓ Source account (account 1) authenticated")
 
-    dest_service = get_drive_service(DEST_CREDENTIALS, DEST_TOKEN)
+    dest_auth = (DEST_CREDENTIALS, DEST_TOKEN)
+    get_thread_drive_service(*dest_auth)
     print("✓ Destination account (account 2) authenticated")
 
+    cache = None if args.no_cache else DriveCache(num_retries=DRIVE_NUM_RETRIES)
+
     # Process files
-    process_files(
-        source_service, SOURCE_FOLDER_ID, dest_service, DEST_FOLDER_ID, args.days
-    )
+    try:
+        process_files(
+            source_auth,
+            SOURCE_FOLDER_ID,
+            dest_auth,
+            DEST_FOLDER_ID,
+            args.days,
+            cache,
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
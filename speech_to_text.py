@@ -4,55 +4,143 @@ Speech-to-Text using Groq API (Whisper Large V3)
 Handles large files by compressing them if needed
 """
 import os
+import json
 import subprocess
 from pathlib import Path
+from typing import Optional
 from groq import Groq
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Groq client
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# Initialize Groq client (retries 429s/5xx, honouring Retry-After)
+client = Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=5)
 
 # Groq API file size limit (25MB)
 MAX_FILE_SIZE = 25 * 1024 * 1024
 
-def compress_audio(input_path: Path, output_path: Path) -> bool:
+# Codecs that can be copied without re-encoding, and the container to use
+REMUX_SUFFIXES = {"mp3": ".mp3", "opus": ".ogg"}
+
+def probe_audio(input_path: Path) -> Optional[dict]:
+    """
+    Read the codec, bitrate and duration of an audio file with ffprobe
+
+    Args:
+        input_path: Path to audio file
+
+    Returns:
+        dict with codec_name, bit_rate (bits/s) and duration (seconds),
+        or None if the file could not be probed
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name,sample_rate,channels,bit_rate:format=duration",
+        "-of", "json",
+        str(input_path)
+    ]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except FileNotFoundError:
+        return None
+    if result.returncode != 0:
+        return None
+
+    info = json.loads(result.stdout)
+    streams = info.get("streams", [])
+    if not streams:
+        return None
+
+    return {
+        "codec_name": streams[0].get("codec_name"),
+        "bit_rate": int(streams[0].get("bit_rate") or 0),
+        "duration": float(info.get("format", {}).get("duration") or 0),
+    }
+
+
+def compress_audio(input_path: Path, output_path: Path, remux: bool = True) -> Optional[Path]:
     """
     Compress audio file using ffmpeg
 
     Args:
         input_path: Path to input audio file
-        output_path: Path to output compressed file
+        output_path: Path to output compressed file (its suffix is replaced
+            to match the output codec)
+        remux: Copy the audio stream without re-encoding when it looks small
+            enough (False = always re-encode)
 
     Returns:
-        bool: True if successful
+        Path of the compressed file if successful, None otherwise
     """
     try:
-        # Use ffmpeg to compress audio to smaller size
-        # -ar 16000: Set sample rate to 16kHz (sufficient for speech)
-        # -ac 1: Convert to mono
-        # -b:a 32k: Set audio bitrate to 32kbps
-        cmd = [
-            "ffmpeg", "-i", str(input_path),
-            "-ar", "16000",
-            "-ac", "1",
-            "-b:a", "32k",
-            "-y",  # Overwrite output file if exists
-            str(output_path)
-        ]
+        probe = probe_audio(input_path)
+        remuxing = (
+            remux
+            and probe
+            and probe["codec_name"] in REMUX_SUFFIXES
+            and 0 < probe["bit_rate"] * probe["duration"] / 8 < MAX_FILE_SIZE
+        )
+        if remuxing:
+            # The audio stream itself fits (the excess is video/cover art/tags),
+            # so copy it into a matching container instead of re-encoding
+            suffix = REMUX_SUFFIXES[probe["codec_name"]]
+            output_path = Path(output_path).with_suffix(suffix)
+            print("Audio stream already fits the limit, remuxing without re-encoding...")
+            cmd = [
+                "ffmpeg", "-i", str(input_path),
+                "-map", "0:a:0",
+                "-c:a", "copy",
+                "-y",  # Overwrite output file if exists
+                str(output_path)
+            ]
+        else:
+            output_path = Path(output_path).with_suffix(".ogg")
+
+            # Use ffmpeg to compress audio to smaller size
+            # -ar 16000: Set sample rate to 16kHz (sufficient for speech)
+            # -ac 1: Convert to mono
+            # -c:a libopus -b:a 12k: Opus at 12kbps (~4.5 hours fit in 25MB)
+            # -application voip -vbr on -frame_duration 60: Tune for speech
+            # -threads 0: Let ffmpeg use all cores
+            cmd = [
+                "ffmpeg", "-i", str(input_path),
+                "-ar", "16000",
+                "-ac", "1",
+                "-c:a", "libopus",
+                "-b:a", "12k",
+                "-application", "voip",
+                "-vbr", "on",
+                "-frame_duration", "60",
+                "-threads", "0",
+                "-y",  # Overwrite output file if exists
+                str(output_path)
+            ]
 
         result = subprocess.run(cmd, capture_output=True, text=True)
-        return result.returncode == 0
+        if result.returncode != 0:
+            if output_path.exists():
+                output_path.unlink()
+            return None
+
+        # ffprobe's bitrate is only an estimate for VBR MP3s without a Xing
+        # header, so a copied stream can still be too large; re-encode instead
+        if remuxing and output_path.stat().st_size > MAX_FILE_SIZE:
+            print("Remuxed audio is still too large, re-encoding...")
+            output_path.unlink()
+            return compress_audio(input_path, output_path, remux=False)
+
+        return output_path
     except FileNotFoundError:
         print("Error: ffmpeg not found. Please install ffmpeg:")
         print("  macOS: brew install ffmpeg")
         print("  Ubuntu/Debian: sudo apt-get install ffmpeg")
-        return False
+        return None
     except Exception as e:
         print(f"Error compressing audio: {e}")
-        return False
+        return None
 
 def get_file_size_mb(file_path: Path) -> float:
     """Get file size in megabytes"""
@@ -107,10 +195,11 @@ def transcribe_audio(audio_file_path: Path) -> dict:
     try:
         if file_size_mb > 25:
             print(f"File exceeds 25MB limit. Compressing...")
-            temp_compressed_file = audio_file_path.parent / f"temp_compressed_{audio_file_path.name}"
-            temp_compressed_file = temp_compressed_file.with_suffix('.mp3')
-
-            if not compress_audio(audio_file_path, temp_compressed_file):
+            temp_compressed_file = compress_audio(
+                audio_file_path,
+                audio_file_path.parent / f"temp_compressed_{audio_file_path.name}",
+            )
+            if temp_compressed_file is None:
                 raise Exception("Failed to compress audio file")
 
             compressed_size_mb = get_file_size_mb(temp_compressed_file)
@@ -123,9 +212,9 @@ def transcribe_audio(audio_file_path: Path) -> dict:
 
         print(f"Transcribing: {audio_file_path.name}")
 
-        with open(file_to_transcribe, "rb") as audio_file:
+        with open(file_to_transcribe, "rb", buffering=1024 * 1024) as audio_file:
             transcription = client.audio.transcriptions.create(
-                file=(file_to_transcribe.name, audio_file.read()),
+                file=(file_to_transcribe.name, audio_file),
                 model="whisper-large-v3",
                 response_format="verbose_json",
                 temperature=0.0